@@ -1,10 +1,15 @@
+import asyncio
 import logging
 import os
 import re
+import time
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Tuple
+from types import MappingProxyType
+from typing import Callable, NamedTuple, Optional, List, Dict, Tuple, Union
 
 import httpx
+import numpy as np
+import orjson
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import (
@@ -15,6 +20,8 @@ from telegram.ext import (
     filters,
 )
 
+from utils._njit import njit
+
 log = logging.getLogger("bot")
 
 # =============================================================================
@@ -43,8 +50,35 @@ MIN_SCORE = int(os.getenv("MIN_SCORE") or "70")              # score mínimo par
 MTF_FILTER = (os.getenv("MTF_FILTER") or "1").strip() == "1"
 MTF_TIMEFRAME = (os.getenv("MTF_TIMEFRAME") or "1h").strip() # timeframe maior (filtro)
 
-# Anti-spam: último estado por (chat, symbol, tf)
-LAST_STATE: Dict[Tuple[int, str, str], str] = {}
+# candles pedidos à TwelveData: só o que os indicadores usam
+_MAIN_BARS = max(EMA_LENGTH, VI_LENGTH + 1, ATR_LENGTH + 1)  # EMA + VI/ATR
+_HTF_BARS = VI_LENGTH + 1                                     # só VI no filtro MTF
+
+# Anti-spam: último estado por chat -> tf -> symbol
+_SIG_NONE, _SIG_BUY, _SIG_SELL, _SIG_WAIT = 0, 1, 2, 3
+_SIG_CODES = {"BUY": _SIG_BUY, "SELL": _SIG_SELL, "WAIT": _SIG_WAIT}
+LAST_STATE: Dict[int, Dict[str, Dict[str, int]]] = {}
+
+# Cliente HTTP compartilhado (keep-alive/HTTP2 para a TwelveData)
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+# Cache curto de candles por (symbol, interval): TTL em segundos por timeframe
+# (no máximo 30s e nunca mais que um tick do scanner: o preço de entrada sai do último candle)
+_CANDLE_TTL: Dict[str, float] = {"1min": 20}
+_CANDLE_TTL_MAX = min(30, SCAN_INTERVAL_SECONDS)
+_CANDLE_CACHE_MAX = 256
+_CANDLE_CACHE: Dict[Tuple[str, str], Tuple[float, "Candles"]] = {}
+
+# Último resultado dos indicadores por (symbol, interval):
+# ((datetime, high, low, close) do último candle, (vi+, vi-, atr, ema))
+_RESULT_CACHE: Dict[Tuple[str, str], Tuple[Tuple[str, float, float, float], Tuple[float, float, float, float]]] = {}
+
+# Buscas em andamento por (symbol, interval): (outputsize, future) — junta pedidos simultâneos
+_INFLIGHT: Dict[Tuple[str, str], Tuple[int, asyncio.Future]] = {}
+
+# Limita chamadas simultâneas à TwelveData (rate limit)
+# (criado sob demanda no loop que roda o bot, como o _CLIENT)
+_FETCH_SEMAPHORE: Optional[asyncio.Semaphore] = None
 
 # Config por chat
 AUTO_ENABLED: Dict[int, bool] = {}
@@ -52,24 +86,40 @@ AUTO_TFS_BY_CHAT: Dict[int, List[str]] = {}
 AUTO_SYMBOLS_BY_CHAT: Dict[int, List[str]] = {}
 
 
-@dataclass
-class Candle:
-    t: str
-    o: float
-    h: float
-    l: float
-    c: float
+@dataclass(frozen=True, eq=False)
+class Candles:
+    # colunas (SoA), mais antigo -> mais recente
+    __slots__ = ("t", "o", "h", "l", "c")
+    t: List[str]
+    o: np.ndarray
+    h: np.ndarray
+    l: np.ndarray
+    c: np.ndarray
+
+
+class TradePlan(NamedTuple):
+    entry: float
+    sl: float
+    tp1: float
+    tp2: float
+    tp3: float
 
 
 # =============================================================================
 # SYMBOL PARSING
 # =============================================================================
+_STRIP_TABLE = str.maketrans("", "", "#$")
+_SIX_LETTER = re.compile(r"^[A-Z]{6}$")
+_SYM_RE = re.compile(r"^[A-Z0-9._-]{3,15}(\/[A-Z0-9._-]{3,15})?$")
+_M_MAP = MappingProxyType({"M1": "1min", "M5": "5min", "M15": "15min", "M30": "30min", "H1": "1h", "H4": "4h", "D1": "1day"})
+
+
 def _normalize_symbol(raw: str) -> str:
-    s = raw.strip().upper().replace("#", "").replace("$", "")
+    s = raw.translate(_STRIP_TABLE).strip().upper()
     if "/" in s:
         return s
     # XAUUSD -> XAU/USD, BTCUSD -> BTC/USD, EURUSD -> EUR/USD
-    if re.match(r"^[A-Z]{6}$", s):
+    if _SIX_LETTER.match(s):
         return f"{s[:3]}/{s[3:]}"
     return s
 
@@ -87,14 +137,13 @@ def _extract_symbol_and_interval(text: str) -> Tuple[Optional[str], Optional[str
         return None, None
 
     sym = _normalize_symbol(first)
-    if not re.match(r"^[A-Z0-9._-]{3,15}(\/[A-Z0-9._-]{3,15})?$", sym):
+    if not _SYM_RE.match(sym):
         return None, None
 
     interval = None
     if len(parts) >= 2:
-        raw = parts[1].strip().upper()
-        m_map = {"M1": "1min", "M5": "5min", "M15": "15min", "M30": "30min", "H1": "1h", "H4": "4h", "D1": "1day"}
-        interval = m_map.get(raw, parts[1].strip().lower())
+        tf = parts[1]  # split() já remove os espaços
+        interval = _M_MAP.get(tf.upper(), tf.lower())
 
     return sym, interval
 
@@ -103,14 +152,63 @@ def _parse_csv_list(s: str) -> List[str]:
     return [x.strip() for x in s.split(",") if x.strip()]
 
 
+# defaults parseados (e símbolos já normalizados) uma vez no import
+_DEFAULT_TFS: Tuple[str, ...] = tuple(_parse_csv_list(AUTO_TFS))
+_DEFAULT_SYMS: Tuple[str, ...] = tuple(_normalize_symbol(s) for s in _parse_csv_list(DEFAULT_SYMBOLS))
+
+
 # =============================================================================
 # TWELVE DATA
 # =============================================================================
-async def fetch_candles_twelve(symbol: str, interval: str, outputsize: int = 260) -> List[Candle]:
+def _get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            base_url="https://api.twelvedata.com",
+            timeout=httpx.Timeout(12.0, connect=6.0),
+            # keep-alive maior que o intervalo do scanner, senão a conexão cai entre ticks
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=40, keepalive_expiry=SCAN_INTERVAL_SECONDS + 30),
+            http2=True,
+        )
+    return _CLIENT
+
+
+async def close_client(app: Application) -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+def _candles_from_payload(data) -> Candles:
+    if isinstance(data, dict) and data.get("status") == "error":
+        raise RuntimeError(f"TwelveData error: {data.get('message', 'unknown error')}")
+
+    values = data.get("values") if isinstance(data, dict) else None
+    if not values:
+        raise RuntimeError("TwelveData não retornou candles (values vazio).")
+
+    n = len(values)
+    t: List[str] = [""] * n
+    o = np.empty(n, dtype=np.float64)
+    h = np.empty(n, dtype=np.float64)
+    l = np.empty(n, dtype=np.float64)
+    c = np.empty(n, dtype=np.float64)
+    j = n - 1  # inverte pelo índice (mais antigo -> mais recente), sem copiar a lista
+    for row in values:
+        t[j] = row["datetime"]
+        o[j] = float(row["open"])
+        h[j] = float(row["high"])
+        l[j] = float(row["low"])
+        c[j] = float(row["close"])
+        j -= 1
+    return Candles(t=t, o=o, h=h, l=l, c=c)
+
+
+async def _get_time_series(symbol: str, interval: str, outputsize: int):
     if not TWELVE_API_KEY:
         raise RuntimeError("TWELVE_API_KEY não configurada no Railway.")
 
-    url = "https://api.twelvedata.com/time_series"
     params = {
         "symbol": symbol,
         "interval": interval,
@@ -119,79 +217,190 @@ async def fetch_candles_twelve(symbol: str, interval: str, outputsize: int = 260
         "format": "JSON",
     }
 
-    timeout = httpx.Timeout(12.0, connect=6.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        data = r.json()
+    r = await _get_client().get("/time_series", params=params)
+    r.raise_for_status()
+    return orjson.loads(r.content)
 
-    if isinstance(data, dict) and data.get("status") == "error":
-        raise RuntimeError(f"TwelveData error: {data.get('message', 'unknown error')}")
-
-    values = data.get("values") if isinstance(data, dict) else None
-    if not values:
-        raise RuntimeError("TwelveData não retornou candles (values vazio).")
 
-    candles: List[Candle] = []
-    for row in reversed(values):  # inverter (mais antigo -> mais recente)
-        candles.append(Candle(
-            t=row["datetime"],
-            o=float(row["open"]),
-            h=float(row["high"]),
-            l=float(row["low"]),
-            c=float(row["close"]),
-        ))
+def _cache_get(symbol: str, interval: str, outputsize: int) -> Optional[Candles]:
+    hit = _CANDLE_CACHE.get((symbol, interval))
+    if hit is None:
+        return None
+    ts, candles = hit
+    if time.monotonic() - ts >= min(_CANDLE_TTL.get(interval, _CANDLE_TTL_MAX), _CANDLE_TTL_MAX) or len(candles.c) < outputsize:
+        return None
     return candles
 
 
+def _cache_put(symbol: str, interval: str, candles: Candles) -> None:
+    key = (symbol, interval)
+    _CANDLE_CACHE.pop(key, None)  # reinsere no fim (FIFO)
+    _CANDLE_CACHE[key] = (time.monotonic(), candles)
+    while len(_CANDLE_CACHE) > _CANDLE_CACHE_MAX:
+        del _CANDLE_CACHE[next(iter(_CANDLE_CACHE))]
+
+
+def _inflight_get(symbol: str, interval: str, outputsize: int) -> Optional[asyncio.Future]:
+    hit = _INFLIGHT.get((symbol, interval))
+    if hit is None or hit[0] < outputsize:
+        return None
+    return hit[1]
+
+
+def _inflight_start(symbols: List[str], interval: str, outputsize: int) -> Dict[str, asyncio.Future]:
+    loop = asyncio.get_running_loop()
+    futs: Dict[str, asyncio.Future] = {}
+    for sym in symbols:
+        futs[sym] = loop.create_future()
+        _INFLIGHT[(sym, interval)] = (outputsize, futs[sym])
+    return futs
+
+
+def _inflight_finish(interval: str, futs: Dict[str, asyncio.Future], results: Dict[str, Union[Candles, Exception]]) -> None:
+    # sempre resolve os futures (inclusive em erro/cancelamento) para ninguém ficar esperando
+    for sym, fut in futs.items():
+        key = (sym, interval)
+        if key in _INFLIGHT and _INFLIGHT[key][1] is fut:
+            del _INFLIGHT[key]
+        fut.set_result(results.get(sym) or RuntimeError(f"TwelveData não retornou candles para {sym}."))
+
+
+async def fetch_candles_twelve(symbol: str, interval: str, outputsize: int = _MAIN_BARS) -> Candles:
+    candles = _cache_get(symbol, interval, outputsize)
+    if candles is not None:
+        return candles
+
+    # mesma busca já em andamento (outro chat/scanner): espera por ela
+    fut = _inflight_get(symbol, interval, outputsize)
+    if fut is not None:
+        res = await asyncio.shield(fut)
+        if isinstance(res, Exception):
+            raise res
+        return res
+
+    futs = _inflight_start([symbol], interval, outputsize)
+    results: Dict[str, Union[Candles, Exception]] = {}
+    try:
+        data = await _get_time_series(symbol, interval, outputsize)
+        candles = _candles_from_payload(data)
+        _cache_put(symbol, interval, candles)
+        results[symbol] = candles
+        return candles
+    except Exception as e:
+        results[symbol] = e
+        raise
+    finally:
+        _inflight_finish(interval, futs, results)
+
+
+async def fetch_candles_batch(symbols: List[str], interval: str, outputsize: int = _MAIN_BARS) -> Dict[str, Candles]:
+    # Uma chamada para vários ativos: a TwelveData responde um dict por símbolo.
+    # Ativos com erro ficam de fora do resultado (só loga). Só busca o que não está
+    # no cache nem já sendo buscado por outra tarefa.
+    out: Dict[str, Candles] = {}
+    missing: List[str] = []
+    waiting: Dict[str, asyncio.Future] = {}
+    for sym in dict.fromkeys(symbols):
+        candles = _cache_get(sym, interval, outputsize)
+        if candles is not None:
+            out[sym] = candles
+            continue
+        fut = _inflight_get(sym, interval, outputsize)
+        if fut is not None:
+            waiting[sym] = fut
+        else:
+            missing.append(sym)
+
+    if missing:
+        futs = _inflight_start(missing, interval, outputsize)
+        results: Dict[str, Union[Candles, Exception]] = {}
+        try:
+            data = await _get_time_series(",".join(missing), interval, outputsize)
+
+            # com um só ativo a resposta é o próprio payload: erro dele fica só nele
+            if len(missing) == 1:
+                payloads = {missing[0]: data}
+            elif isinstance(data, dict) and data.get("status") == "error":
+                raise RuntimeError(f"TwelveData error: {data.get('message', 'unknown error')}")
+            else:
+                payloads = data
+            for sym in missing:
+                try:
+                    candles = _candles_from_payload(payloads.get(sym))
+                except (RuntimeError, KeyError, TypeError, ValueError) as e:  # erro ou linha inválida do ativo
+                    log.warning("TwelveData %s %s: %s", sym, interval, e)
+                    results[sym] = e
+                    continue
+                _cache_put(sym, interval, candles)
+                results[sym] = out[sym] = candles
+        except Exception as e:
+            for sym in missing:
+                results.setdefault(sym, e)
+            if not out and not waiting:
+                raise
+            # ativos do cache e os buscados por outra tarefa continuam valendo
+            log.warning("TwelveData %s %s: %s", ",".join(missing), interval, e)
+        finally:
+            _inflight_finish(interval, futs, results)
+
+    for sym, fut in waiting.items():
+        res = await asyncio.shield(fut)
+        if not isinstance(res, Exception):
+            out[sym] = res
+    return out
+
+
 # =============================================================================
 # INDICATORS
 # =============================================================================
-def _true_range(curr: Candle, prev_close: float) -> float:
-    return max(curr.h - curr.l, abs(curr.h - prev_close), abs(curr.l - prev_close))
-
-
-def atr(candles: List[Candle], length: int) -> float:
-    if len(candles) < length + 1:
-        raise RuntimeError("Poucos candles para ATR.")
-    trs = []
-    for i in range(1, len(candles)):
-        trs.append(_true_range(candles[i], candles[i - 1].c))
-    window = trs[-length:]
-    return sum(window) / len(window)
+@njit(cache=True, fastmath=True)
+def _vortex_atr_loop(h, l, c, vi_length, atr_length):
+    # Uma única passada reversa pelos últimos candles: VI+/VI- e ATR sem arrays temporários.
+    n = h.shape[0]
+    sum_vmp = 0.0
+    sum_vmm = 0.0
+    sum_tr_vi = 0.0
+    sum_tr_atr = 0.0
+    for j in range(max(vi_length, atr_length)):
+        i = n - 1 - j
+        tr = max(h[i] - l[i], max(abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1])))
+        if j < vi_length:
+            sum_vmp += abs(h[i] - l[i - 1])
+            sum_vmm += abs(l[i] - h[i - 1])
+            sum_tr_vi += tr
+        if j < atr_length:
+            sum_tr_atr += tr
+    if sum_tr_vi == 0:
+        sum_tr_vi = 1e-9
+    return sum_vmp / sum_tr_vi, sum_vmm / sum_tr_vi, sum_tr_atr / atr_length
+
+
+def vortex_atr(candles: Candles, vi_length: int, atr_length: int) -> Tuple[float, float, float]:
+    if len(candles.c) < max(vi_length, atr_length) + 1:
+        raise RuntimeError("Poucos candles para cálculo.")
+    return _vortex_atr_loop(candles.h, candles.l, candles.c, vi_length, atr_length)
 
 
-def vortex(candles: List[Candle], length: int) -> Tuple[float, float]:
+def vortex(candles: Candles, length: int) -> Tuple[float, float]:
     # Mantém a lógica igual; só o nome exibido é XAURON.
-    if len(candles) < length + 1:
+    if len(candles.c) < length + 1:
         raise RuntimeError("Poucos candles para cálculo.")
-    vm_plus, vm_minus, tr = [], [], []
-
-    for i in range(1, len(candles)):
-        c = candles[i]
-        p = candles[i - 1]
-        vm_plus.append(abs(c.h - p.l))
-        vm_minus.append(abs(c.l - p.h))
-        tr.append(_true_range(c, p.c))
-
-    vm_plus_w = vm_plus[-length:]
-    vm_minus_w = vm_minus[-length:]
-    tr_w = tr[-length:]
-
-    sum_tr = sum(tr_w) if sum(tr_w) != 0 else 1e-9
-    vi_plus = sum(vm_plus_w) / sum_tr
-    vi_minus = sum(vm_minus_w) / sum_tr
+    vi_plus, vi_minus, _ = _vortex_atr_loop(candles.h, candles.l, candles.c, length, length)
     return vi_plus, vi_minus
 
 
-def ema(values: List[float], length: int) -> float:
+# aquece o JIT (ou carrega do cache) no import, fora do caminho das mensagens
+_vortex_atr_loop(np.zeros(2), np.zeros(2), np.zeros(2), 1, 1)
+
+
+def ema(values: np.ndarray, length: int) -> float:
     if len(values) < length:
         raise RuntimeError("Poucos valores para EMA.")
+    # forma fechada da recursão e = v*k + e*(1-k), semente values[0]: um produto escalar
     k = 2 / (length + 1)
-    e = values[0]
-    for v in values[1:]:
-        e = v * k + e * (1 - k)
-    return e
+    decay = (1 - k) ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)
+    decay[1:] *= k
+    return float(decay @ values)
 
 
 def atr_percent(atr_val: float, price: float) -> float:
@@ -210,56 +419,95 @@ def decide_signal(vi_p: float, vi_m: float) -> Tuple[str, float]:
     return ("BUY" if vi_p > vi_m else "SELL"), strength
 
 
-def build_trade_plan(last_price: float, direction: str, atr_val: float) -> Dict[str, float]:
+def build_trade_plan(last_price: float, direction: str, atr_val: float) -> TradePlan:
     entry = last_price
-    if direction == "BUY":
-        sl = entry - atr_val * ATR_SL_MULT
-        tp1 = entry + atr_val * ATR_TP1_MULT
-        tp2 = entry + atr_val * ATR_TP2_MULT
-        tp3 = entry + atr_val * ATR_TP3_MULT
-    else:
-        sl = entry + atr_val * ATR_SL_MULT
-        tp1 = entry - atr_val * ATR_TP1_MULT
-        tp2 = entry - atr_val * ATR_TP2_MULT
-        tp3 = entry - atr_val * ATR_TP3_MULT
-    return {"entry": entry, "sl": sl, "tp1": tp1, "tp2": tp2, "tp3": tp3}
+    step = atr_val if direction == "BUY" else -atr_val  # direção vira o sinal do passo
+    return TradePlan(
+        entry,
+        entry - step * ATR_SL_MULT,
+        entry + step * ATR_TP1_MULT,
+        entry + step * ATR_TP2_MULT,
+        entry + step * ATR_TP3_MULT,
+    )
+
+
+_FMT_2DP = "{:.2f}".format
+_FMT_5DP = "{:.5f}".format
+
+
+_FMT_BY_MAGNITUDE = (_FMT_5DP, _FMT_2DP)  # índice: x >= 100
 
 
 def fmt_price(x: float) -> str:
-    return f"{x:.2f}" if x >= 100 else f"{x:.5f}"
+    return _FMT_BY_MAGNITUDE[int(x >= 100)](x)
+
+
+# casas decimais fixas para ativos conhecidos; o resto cai no fmt_price
+_FMT_BY_SYMBOL: Dict[str, Callable[[float], str]] = {
+    "XAU/USD": _FMT_2DP,
+    "EUR/USD": _FMT_5DP,
+    "GBP/USD": _FMT_5DP,
+    "AUD/USD": _FMT_5DP,
+    "NZD/USD": _FMT_5DP,
+    "USD/CAD": _FMT_5DP,
+    "USD/CHF": _FMT_5DP,
+}
+
 
+# caracteres especiais do Markdown (legado) do Telegram
+_MD_TABLE = str.maketrans({ch: "\\" + ch for ch in "_*`["})
 
-def format_alert(symbol: str, interval: str, signal: str, strength: float, vi_p: float, vi_m: float, atr_val: float, plan: Dict[str, float], score: int) -> str:
+
+def _md_escape(s: str, limit: int = 500) -> str:
+    return s[:limit].translate(_MD_TABLE)
+
+
+def format_alert(symbol: str, interval: str, signal: str, strength: float, vi_p: float, vi_m: float, atr_val: float, plan: TradePlan, score: int) -> str:
+    fmt = _FMT_BY_SYMBOL.get(symbol, fmt_price)
     return (
         f"🚨 *ALERTA XAURON*\n"
         f"• Ativo: *{symbol}*\n"
         f"• TF: *{interval}*\n\n"
         f"✅ *Sinal:* *{signal}*\n"
-        f"🎯 Entrada: `{fmt_price(plan['entry'])}`\n"
-        f"🛡 Stop: `{fmt_price(plan['sl'])}`\n"
-        f"🏁 TP1: `{fmt_price(plan['tp1'])}` | TP2: `{fmt_price(plan['tp2'])}` | TP3: `{fmt_price(plan['tp3'])}`\n\n"
+        f"🎯 Entrada: `{fmt(plan.entry)}`\n"
+        f"🛡 Stop: `{fmt(plan.sl)}`\n"
+        f"🏁 TP1: `{fmt(plan.tp1)}` | TP2: `{fmt(plan.tp2)}` | TP3: `{fmt(plan.tp3)}`\n\n"
         f"🔎 VI+ `{vi_p:.3f}` vs VI- `{vi_m:.3f}` | Força `{strength:.3f}` | ATR `{atr_val:.3f}`\n"
         f"⭐ Score: *{score}/100*"
     )
 
 
-async def analyze_once(symbol: str, interval: str) -> Tuple[str, Dict[str, float], float, float, float, float, int]:
-    # candles do timeframe principal
-    candles = await fetch_candles_twelve(symbol, interval, outputsize=260)
-    closes = [c.c for c in candles]
-    last = candles[-1]
-    last_price = last.c
+def _indicators(symbol: str, interval: str, candles: Candles) -> Tuple[float, float, float, float]:
+    # reaproveita o cálculo enquanto o último candle não mudar (horário, máxima, mínima e fechamento)
+    key = (symbol, interval)
+    last_bar = (candles.t[-1], float(candles.h[-1]), float(candles.l[-1]), float(candles.c[-1]))
+    hit = _RESULT_CACHE.get(key)
+    if hit is not None and hit[0] == last_bar:
+        return hit[1]
+
+    vi_p, vi_m, atr_val = vortex_atr(candles, VI_LENGTH, ATR_LENGTH)
+    ema_val = ema(candles.c[-EMA_LENGTH:], EMA_LENGTH)
+
+    _RESULT_CACHE.pop(key, None)
+    _RESULT_CACHE[key] = (last_bar, (vi_p, vi_m, atr_val, ema_val))
+    while len(_RESULT_CACHE) > _CANDLE_CACHE_MAX:
+        del _RESULT_CACHE[next(iter(_RESULT_CACHE))]
+    return vi_p, vi_m, atr_val, ema_val
+
+
+def evaluate(symbol: str, interval: str, candles: Candles, candles_htf: Optional[Candles]) -> Tuple[str, TradePlan, float, float, float, float, int]:
+    # candles do timeframe principal (+ timeframe maior quando MTF_FILTER)
+    last_open = float(candles.o[-1])
+    last_price = float(candles.c[-1])
 
     # indicadores
-    vi_p, vi_m = vortex(candles, VI_LENGTH)
-    atr_val = atr(candles, ATR_LENGTH)
+    vi_p, vi_m, atr_val, ema_val = _indicators(symbol, interval, candles)
 
     signal, strength = decide_signal(vi_p, vi_m)
     direction = "BUY" if vi_p > vi_m else "SELL"
     plan = build_trade_plan(last_price, direction, atr_val)
 
     # EMA trend filter
-    ema_val = ema(closes[-EMA_LENGTH:], EMA_LENGTH)
     trend_ok = (last_price > ema_val) if direction == "BUY" else (last_price < ema_val)
 
     # Volatility filter (ATR%)
@@ -269,7 +517,6 @@ async def analyze_once(symbol: str, interval: str) -> Tuple[str, Dict[str, float
     # MTF filter (opcional)
     mtf_ok = True
     if MTF_FILTER:
-        candles_htf = await fetch_candles_twelve(symbol, MTF_TIMEFRAME, outputsize=220)
         vi_p_htf, vi_m_htf = vortex(candles_htf, VI_LENGTH)
         htf_dir = "BUY" if vi_p_htf > vi_m_htf else "SELL"
         mtf_ok = (htf_dir == direction)
@@ -281,7 +528,7 @@ async def analyze_once(symbol: str, interval: str) -> Tuple[str, Dict[str, float
     score += 20 if strength >= (MIN_STRENGTH + 0.10) else (10 if strength >= MIN_STRENGTH else 0)
     score += 15 if vol_ok else 0
     # candle confirmation simples
-    score += 10 if ((direction == "BUY" and last.c >= last.o) or (direction == "SELL" and last.c <= last.o)) else 0
+    score += 10 if ((direction == "BUY" and last_price >= last_open) or (direction == "SELL" and last_price <= last_open)) else 0
 
     # regras finais: só alerta se for bom
     if signal == "WAIT" or (MTF_FILTER and not mtf_ok) or (not trend_ok) or (not vol_ok) or (score < MIN_SCORE):
@@ -290,15 +537,42 @@ async def analyze_once(symbol: str, interval: str) -> Tuple[str, Dict[str, float
     return signal, plan, strength, vi_p, vi_m, atr_val, score
 
 
+async def analyze_once(symbol: str, interval: str) -> Tuple[str, TradePlan, float, float, float, float, int]:
+    if not MTF_FILTER:
+        candles = await fetch_candles_twelve(symbol, interval, outputsize=_MAIN_BARS)
+        return evaluate(symbol, interval, candles, None)
+
+    # timeframe principal e o do filtro MTF em paralelo
+    candles, candles_htf = await asyncio.gather(
+        fetch_candles_twelve(symbol, interval, outputsize=_MAIN_BARS),
+        fetch_candles_twelve(symbol, MTF_TIMEFRAME, outputsize=_HTF_BARS),
+    )
+    return evaluate(symbol, interval, candles, candles_htf)
+
+
 # =============================================================================
 # COMMANDS
 # =============================================================================
+def _prune_state(chat_id: int) -> None:
+    # remove estados de ativos/timeframes que saíram da config do chat
+    states = LAST_STATE.get(chat_id)
+    if not states:
+        return
+    tfs = set(AUTO_TFS_BY_CHAT.get(chat_id) or _DEFAULT_TFS)
+    syms = set(AUTO_SYMBOLS_BY_CHAT.get(chat_id) or _DEFAULT_SYMS)
+    for tf in [t for t in states if t not in tfs]:
+        del states[tf]
+    for tf_states in states.values():
+        for sym in [s for s in tf_states if s not in syms]:
+            del tf_states[sym]
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
 
     AUTO_ENABLED.setdefault(chat_id, False)
-    AUTO_TFS_BY_CHAT.setdefault(chat_id, _parse_csv_list(AUTO_TFS))
-    AUTO_SYMBOLS_BY_CHAT.setdefault(chat_id, _parse_csv_list(DEFAULT_SYMBOLS))
+    AUTO_TFS_BY_CHAT.setdefault(chat_id, list(_DEFAULT_TFS))
+    AUTO_SYMBOLS_BY_CHAT.setdefault(chat_id, list(_DEFAULT_SYMS))
 
     await update.message.reply_text(
         "👋 *XAURON Scanner*\n\n"
@@ -334,6 +608,8 @@ async def autoscan(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("Use: `/autoscan on` ou `/autoscan off`", parse_mode=ParseMode.MARKDOWN)
         return
     AUTO_ENABLED[chat_id] = (arg == "on")
+    if arg == "off":
+        LAST_STATE.pop(chat_id, None)
     await update.message.reply_text(f"Scanner automático: *{arg.upper()}*", parse_mode=ParseMode.MARKDOWN)
 
 
@@ -345,6 +621,7 @@ async def settf(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
     tfs = _parse_csv_list(raw)
     AUTO_TFS_BY_CHAT[chat_id] = tfs
+    _prune_state(chat_id)
     await update.message.reply_text(f"Timeframes do scanner: `{', '.join(tfs)}`", parse_mode=ParseMode.MARKDOWN)
 
 
@@ -354,8 +631,9 @@ async def setsymbols(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     if not raw:
         await update.message.reply_text("Use: `/setsymbols XAUUSD,EURUSD,BTCUSD`", parse_mode=ParseMode.MARKDOWN)
         return
-    syms = _parse_csv_list(raw)
+    syms = [_normalize_symbol(s) for s in _parse_csv_list(raw)]
     AUTO_SYMBOLS_BY_CHAT[chat_id] = syms
+    _prune_state(chat_id)
     await update.message.reply_text(f"Ativos do scanner: `{', '.join(syms)}`", parse_mode=ParseMode.MARKDOWN)
 
 
@@ -384,49 +662,109 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
 
     except Exception as e:
-        log.exception("Erro: %s", e)
-        await update.message.reply_text(f"Erro: `{str(e)}`", parse_mode=ParseMode.MARKDOWN)
+        # traceback só em DEBUG: erros da TwelveData em rajada não precisam de stack
+        log.warning("on_text erro: %s", e, exc_info=log.isEnabledFor(logging.DEBUG))
+        await update.message.reply_text(f"Erro: {_md_escape(str(e))}", parse_mode=ParseMode.MARKDOWN)
 
 
 # =============================================================================
 # BACKGROUND SCANNER JOB
 # =============================================================================
-async def autoscan_job(context: ContextTypes.DEFAULT_TYPE) -> None:
-    app = context.application
+def _join_messages(parts: List[str], limit: int = 3800) -> List[str]:
+    out: List[str] = []
+    buf = ""
+    for part in parts:
+        if buf and len(buf) + 2 + len(part) > limit:
+            out.append(buf)
+            buf = ""
+        buf = f"{buf}\n\n{part}" if buf else part
+    if buf:
+        out.append(buf)
+    return out
+
+
+def _get_fetch_semaphore() -> asyncio.Semaphore:
+    global _FETCH_SEMAPHORE
+    if _FETCH_SEMAPHORE is None:
+        _FETCH_SEMAPHORE = asyncio.Semaphore(8)
+    return _FETCH_SEMAPHORE
+
+
+async def _fetch_batch_limited(symbols: List[str], interval: str, outputsize: int) -> Dict[str, Candles]:
+    async with _get_fetch_semaphore():
+        return await fetch_candles_batch(symbols, interval, outputsize=outputsize)
+
+
+async def _scan_chat(app: Application, chat_id: int) -> None:
+    tfs = AUTO_TFS_BY_CHAT.get(chat_id) or _DEFAULT_TFS
+    symbols = AUTO_SYMBOLS_BY_CHAT.get(chat_id) or _DEFAULT_SYMS
+
+    # uma chamada por timeframe com todos os ativos, todas em paralelo (+ filtro MTF)
+    # se o timeframe do MTF já está na lista, reaproveita a mesma chamada
+    htf_in_tfs = MTF_TIMEFRAME in tfs
+    fetches = [_fetch_batch_limited(symbols, tf, _MAIN_BARS) for tf in tfs]
+    if MTF_FILTER and not htf_in_tfs:
+        fetches.append(_fetch_batch_limited(symbols, MTF_TIMEFRAME, _HTF_BARS))
+    results = await asyncio.gather(*fetches, return_exceptions=True)
+
+    # /autoscan off pode ter chegado durante as buscas: não recria o estado nem alerta
+    if not AUTO_ENABLED.get(chat_id):
+        return
 
-    for chat_id, enabled in list(AUTO_ENABLED.items()):
-        if not enabled:
-            continue
+    candles_htf: Dict[str, Candles] = {}
+    if MTF_FILTER:
+        candles_htf = results[tfs.index(MTF_TIMEFRAME)] if htf_in_tfs else results.pop()
+        if isinstance(candles_htf, Exception):
+            log.warning("Scanner erro %s: %s", MTF_TIMEFRAME, candles_htf)
+            return
 
-        tfs = AUTO_TFS_BY_CHAT.get(chat_id) or _parse_csv_list(AUTO_TFS)
-        syms_raw = AUTO_SYMBOLS_BY_CHAT.get(chat_id) or _parse_csv_list(DEFAULT_SYMBOLS)
+    states = LAST_STATE.setdefault(chat_id, {})
+    alerts: List[str] = []
+    for tf, batch in zip(tfs, results):
+        if isinstance(batch, Exception):
+            log.warning("Scanner erro %s: %s", tf, batch)
+            continue
 
-        for raw_sym in syms_raw:
-            symbol = _normalize_symbol(raw_sym)
+        tf_states = states.setdefault(tf, {})
+        for symbol, candles in batch.items():
+            if MTF_FILTER and symbol not in candles_htf:
+                continue
+            try:
+                signal, plan, strength, vi_p, vi_m, atr_val, score = evaluate(symbol, tf, candles, candles_htf.get(symbol))
 
-            for tf in tfs:
-                try:
-                    signal, plan, strength, vi_p, vi_m, atr_val, score = await analyze_once(symbol, tf)
+                # alerta só quando muda para BUY/SELL; WAIT só atualiza o estado (anti-spam)
+                code = _SIG_CODES[signal]
+                if code != tf_states.get(symbol, _SIG_NONE):
+                    tf_states[symbol] = code
+                    if code != _SIG_WAIT:
+                        alerts.append(format_alert(symbol, tf, signal, strength, vi_p, vi_m, atr_val, plan, score))
 
-                    key = (chat_id, symbol, tf)
-                    prev = LAST_STATE.get(key, "NONE")
+            except Exception as e:
+                log.warning("Scanner erro %s %s: %s", symbol, tf, e)
 
-                    # manda só quando muda para BUY/SELL
-                    if signal in ("BUY", "SELL") and signal != prev:
-                        LAST_STATE[key] = signal
-                        msg = format_alert(symbol, tf, signal, strength, vi_p, vi_m, atr_val, plan, score)
-                        await app.bot.send_message(chat_id=chat_id, text=msg, parse_mode=ParseMode.MARKDOWN)
+    # todos os alertas do tick numa mensagem só (quebrando no limite do Telegram)
+    for text in _join_messages(alerts):
+        try:
+            await app.bot.send_message(chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            log.warning("Scanner erro envio %s: %s", chat_id, e)
 
-                    # atualiza WAIT sem mandar msg (anti-spam)
-                    if signal == "WAIT":
-                        LAST_STATE[key] = "WAIT"
 
-                except Exception as e:
-                    log.warning("Scanner erro %s %s: %s", raw_sym, tf, e)
+async def autoscan_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    app = context.application
+    chats = [chat_id for chat_id, enabled in list(AUTO_ENABLED.items()) if enabled]
+    await asyncio.gather(*(_scan_chat(app, chat_id) for chat_id in chats))
 
 
 def build_application(token: str) -> Application:
-    app = Application.builder().token(token).build()
+    app = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(True)  # on_text não fica na fila atrás de outra análise
+        .http_version("2")
+        .post_shutdown(close_client)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_cmd))
@@ -1,14 +1,22 @@
+import asyncio
 import logging
 import os
 import re
 from bot import build_application
 
+try:
+    import uvloop
+except ImportError:  # opcional (não existe no Windows)
+    uvloop = None
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
 )
 log = logging.getLogger("main")
 
+_TOKEN_RE = re.compile(r"^\d+:[A-Za-z0-9_-]{30,}$")
+
 
 def read_token() -> str:
     return (os.getenv("TOKEN") or os.getenv("TELEGRAM") or "").strip()
@@ -19,7 +27,7 @@ def validate_token(token: str) -> None:
         raise RuntimeError("TOKEN vazio. Configure a variável TOKEN no Railway.")
     if token.lower() == "token":
         raise RuntimeError("TOKEN está como 'token' (placeholder). Cole o token real do @BotFather.")
-    if not re.match(r"^\d+:[A-Za-z0-9_-]{30,}$", token):
+    if not _TOKEN_RE.match(token):
         raise RuntimeError(f"TOKEN inválido (formato inesperado). Caracteres lidos: {len(token)}")
 
 
@@ -27,6 +35,9 @@ def main() -> None:
     token = read_token()
     validate_token(token)
 
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     app = build_application(token)
     log.info("Bot iniciando (polling). Token lido com %s caracteres.", len(token))
     app.run_polling(drop_pending_updates=True, allowed_updates=["message"])
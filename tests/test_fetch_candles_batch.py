@@ -0,0 +1,109 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import bot
+
+
+def _payload():
+    return {"values": [
+        {"datetime": str(i), "open": i, "high": i + 1, "low": i - 1, "close": i}
+        for i in range(bot._MAIN_BARS, 0, -1)
+    ]}
+
+
+def _bad_row():
+    data = _payload()
+    data["values"][0]["close"] = None
+    return data
+
+
+def _error():
+    return {"status": "error", "message": "symbol not found"}
+
+
+def _symbol_payload(symbol):
+    if symbol == "BAD/SYM":
+        return _error()
+    if symbol == "ROW/SYM":
+        return _bad_row()
+    return _payload()
+
+
+class FetchCandlesBatchTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        bot._CANDLE_CACHE.clear()
+        bot._INFLIGHT.clear()
+        self.calls = []
+
+        async def fake_get(symbol, interval, outputsize):
+            self.calls.append(symbol)
+            await asyncio.sleep(0.01)
+            syms = symbol.split(",")
+            if "DOWN/SYM" in syms:
+                raise RuntimeError("HTTP 503")
+            if len(syms) == 1:
+                return _symbol_payload(syms[0])
+            return {s: _symbol_payload(s) for s in syms}
+
+        patcher = mock.patch.object(bot, "_get_time_series", fake_get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_bad_symbol_alone_keeps_cached_symbols(self):
+        first = await bot.fetch_candles_batch(["XAU/USD", "BAD/SYM"], "1h")
+        second = await bot.fetch_candles_batch(["XAU/USD", "BAD/SYM"], "1h")
+        self.assertEqual(set(first), {"XAU/USD"})
+        self.assertEqual(set(second), {"XAU/USD"})
+        self.assertEqual(self.calls, ["XAU/USD,BAD/SYM", "BAD/SYM"])
+
+    async def test_bad_symbol_keeps_cached_and_inflight_symbols(self):
+        await bot.fetch_candles_batch(["EUR/USD"], "1h")
+        self.calls.clear()
+
+        owner, mixed = await asyncio.gather(
+            bot.fetch_candles_batch(["XAU/USD"], "1h"),
+            bot.fetch_candles_batch(["EUR/USD", "BAD/SYM", "XAU/USD"], "1h"),
+        )
+        self.assertEqual(set(owner), {"XAU/USD"})
+        self.assertEqual(set(mixed), {"EUR/USD", "XAU/USD"})
+        self.assertEqual(sorted(self.calls), ["BAD/SYM", "XAU/USD"])
+        self.assertEqual(bot._INFLIGHT, {})
+
+    async def test_bad_symbol_keeps_inflight_symbols(self):
+        owner, other = await asyncio.gather(
+            bot.fetch_candles_batch(["XAU/USD"], "1h"),
+            bot.fetch_candles_batch(["BAD/SYM", "XAU/USD"], "1h"),
+        )
+        self.assertEqual(set(owner), {"XAU/USD"})
+        self.assertEqual(set(other), {"XAU/USD"})
+        self.assertEqual(sorted(self.calls), ["BAD/SYM", "XAU/USD"])
+
+    async def test_bad_row_keeps_other_symbols_and_waiters(self):
+        owner, waiter = await asyncio.gather(
+            bot.fetch_candles_batch(["ROW/SYM", "XAU/USD", "EUR/USD"], "1h"),
+            bot.fetch_candles_batch(["XAU/USD"], "1h"),
+        )
+        self.assertEqual(set(owner), {"XAU/USD", "EUR/USD"})
+        self.assertEqual(set(waiter), {"XAU/USD"})
+        self.assertEqual(set(bot._CANDLE_CACHE), {("XAU/USD", "1h"), ("EUR/USD", "1h")})
+
+    async def test_failed_request_keeps_inflight_symbols(self):
+        owner, other = await asyncio.gather(
+            bot.fetch_candles_batch(["XAU/USD"], "1h"),
+            bot.fetch_candles_batch(["DOWN/SYM", "XAU/USD"], "1h"),
+        )
+        self.assertEqual(set(owner), {"XAU/USD"})
+        self.assertEqual(set(other), {"XAU/USD"})
+        self.assertEqual(bot._INFLIGHT, {})
+
+    async def test_failed_request_without_other_symbols_raises(self):
+        with self.assertRaises(RuntimeError):
+            await bot.fetch_candles_batch(["DOWN/SYM"], "1h")
+
+    async def test_bad_symbol_as_whole_request_returns_empty(self):
+        self.assertEqual(await bot.fetch_candles_batch(["BAD/SYM"], "1h"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import numpy as np
+
+import bot
+
+
+def _ref_vortex_atr(h, l, c, vi_length, atr_length):
+    # laços originais (lista de candles) usados como referência
+    vm_plus, vm_minus, tr = [], [], []
+    for i in range(1, len(c)):
+        vm_plus.append(abs(h[i] - l[i - 1]))
+        vm_minus.append(abs(l[i] - h[i - 1]))
+        tr.append(max(h[i] - l[i], abs(h[i] - c[i - 1]), abs(l[i] - c[i - 1])))
+    sum_tr = sum(tr[-vi_length:]) or 1e-9
+    atr_w = tr[-atr_length:]
+    return sum(vm_plus[-vi_length:]) / sum_tr, sum(vm_minus[-vi_length:]) / sum_tr, sum(atr_w) / len(atr_w)
+
+
+def _ref_ema(values, length):
+    k = 2 / (length + 1)
+    e = values[0]
+    for v in values[1:]:
+        e = v * k + e * (1 - k)
+    return e
+
+
+def _random_candles(rng, n):
+    c = np.cumsum(rng.normal(0, 1, n)) + 2000
+    o = c + rng.normal(0, 0.5, n)
+    h = np.maximum(c, o) + rng.random(n)
+    l = np.minimum(c, o) - rng.random(n)
+    return bot.Candles(t=[str(i) for i in range(n)], o=o, h=h, l=l, c=c)
+
+
+class IndicatorsTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(42)
+
+    def test_vortex_atr_matches_reference_loop(self):
+        for vi_length, atr_length in ((14, 14), (14, 20), (21, 7)):
+            for _ in range(50):
+                cs = _random_candles(self.rng, 260)
+                got = bot.vortex_atr(cs, vi_length, atr_length)
+                want = _ref_vortex_atr(cs.h.tolist(), cs.l.tolist(), cs.c.tolist(), vi_length, atr_length)
+                np.testing.assert_allclose(got, want, rtol=1e-12)
+
+    def test_vortex_and_atr_wrappers_match_fused_kernel(self):
+        cs = _random_candles(self.rng, 260)
+        vi_p, vi_m, _ = bot.vortex_atr(cs, 14, 14)
+        np.testing.assert_allclose(bot.vortex(cs, 14), (vi_p, vi_m), rtol=1e-12)
+
+    def test_ema_matches_reference_loop(self):
+        for length in (1, 2, 14, 200):
+            for _ in range(50):
+                values = np.cumsum(self.rng.normal(0, 1, length)) + 2000
+                self.assertAlmostEqual(bot.ema(values, length), _ref_ema(values.tolist(), length), delta=1e-9)
+
+    def test_too_few_bars_raise(self):
+        cs = _random_candles(self.rng, 10)
+        with self.assertRaises(RuntimeError):
+            bot.vortex_atr(cs, 14, 14)
+        with self.assertRaises(RuntimeError):
+            bot.ema(cs.c, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,11 @@
+try:
+    from numba import njit
+except ImportError:  # numba é opcional: sem ele os kernels rodam em Python puro
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(fn):
+            return fn
+
+        return decorator